@@ -0,0 +1,43 @@
+"""
+Gunicorn settings for serving the accent trainer API
+Run with: gunicorn -c gunicorn.conf.py server:app
+"""
+
+import multiprocessing
+import os
+
+# NVML-based availability check: unlike the default one it leaves CUDA
+# uninitialized in the master, so forked workers can still use the GPU
+os.environ.setdefault('PYTORCH_NVML_BASED_CUDA_CHECK', '1')
+import torch
+
+bind = '127.0.0.1:5001'
+
+# Inference releases the GIL inside PyTorch/NumPy, so threads within a
+# worker overlap; separate workers add CPU parallelism on top. With a GPU a
+# single worker keeps one copy of the model on it and lets every request
+# share the same micro-batches.
+worker_class = 'gthread'
+threads = 4
+workers = 1 if torch.cuda.is_available() else max(1, multiprocessing.cpu_count() // 2)
+
+# Import the app in the master so the model weights are loaded once and
+# shared copy-on-write with every forked worker
+preload_app = True
+
+# First requests can include a torch.compile trace
+timeout = 120
+
+def when_ready(server):
+    from server import load_models
+    load_models()
+
+def post_worker_init(worker):
+    # PyTorch defaults to one intra-op thread per core in every worker;
+    # split the cores between workers instead of oversubscribing them
+    torch.set_num_threads(max(1, multiprocessing.cpu_count() // worker.cfg.workers))
+    
+    # Per-process state (compiled graphs, batching thread, speech cache)
+    # doesn't survive the fork, so each worker warms its own in the background
+    from server import start_background_warmup
+    start_background_warmup()
@@ -8,45 +8,121 @@ from flask_cors import CORS
 import tempfile
 import os
 import subprocess
+import wave
 import io
 import json
+import hashlib
+import threading
+import queue
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+from functools import lru_cache
+
+import numpy as np
+from numba import njit
 
 app = Flask(__name__)
 CORS(app)
 
 # Lazy load models
 allosaurus_model = None
+# wav2vec2 weights as loaded on the CPU, and the per-process placed/compiled
+# model that inference actually runs
+_wav2vec2_cpu_model = None
 wav2vec2_model = None
 wav2vec2_processor = None
 wav2vec2_vocab = None
+wav2vec2_emits = None
+# Reduced-precision dtype to autocast wav2vec2 inference to, if any
+wav2vec2_autocast = None
+# Tokens dropped from wav2vec2 output (id 0 is the CTC blank)
+CTC_SPECIAL_TOKENS = {'<pad>', '<s>', '</s>', '<unk>'}
+# Serializes model loading between the warmup thread and request threads
+_model_lock = threading.Lock()
 
 def get_allosaurus():
     global allosaurus_model
     if allosaurus_model is None:
-        print("Loading Allosaurus model...")
-        from allosaurus.app import read_recognizer
-        allosaurus_model = read_recognizer()
-        print("Allosaurus loaded!")
+        with _model_lock:
+            if allosaurus_model is None:
+                print("Loading Allosaurus model...")
+                from allosaurus.app import read_recognizer
+                allosaurus_model = read_recognizer()
+                print("Allosaurus loaded!")
     return allosaurus_model
 
+def _load_wav2vec2_weights():
+    """
+    Load wav2vec2 on the CPU without touching CUDA, so gunicorn's master can
+    do this before forking workers
+    """
+    global _wav2vec2_cpu_model, wav2vec2_processor, wav2vec2_vocab, wav2vec2_emits
+    if _wav2vec2_cpu_model is None:
+        with _model_lock:
+            if _wav2vec2_cpu_model is None:
+                print("Loading wav2vec2 model...")
+                from transformers import Wav2Vec2ForCTC, Wav2Vec2FeatureExtractor
+                from huggingface_hub import hf_hub_download
+                
+                model_name = "facebook/wav2vec2-lv-60-espeak-cv-ft"
+                processor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
+                model = Wav2Vec2ForCTC.from_pretrained(model_name)
+                model.eval()
+                
+                vocab_path = hf_hub_download(repo_id=model_name, filename="vocab.json")
+                with open(vocab_path, 'r') as f:
+                    vocab = json.load(f)
+                id2token = {v: k for k, v in vocab.items()}
+                # Token lookup indexed by id, plus which ids produce a phone
+                size = max(model.config.vocab_size, max(id2token) + 1)
+                wav2vec2_vocab = np.array(
+                    [id2token.get(i, '?') for i in range(size)], dtype=object)
+                wav2vec2_emits = np.array(
+                    [i != 0 and t not in CTC_SPECIAL_TOKENS
+                     for i, t in enumerate(wav2vec2_vocab)], dtype=bool)
+                wav2vec2_processor = processor
+                # Published last so other threads never see a half-loaded model
+                _wav2vec2_cpu_model = model
+                print("wav2vec2 loaded!")
+    return _wav2vec2_cpu_model
+
 def get_wav2vec2():
-    global wav2vec2_model, wav2vec2_processor, wav2vec2_vocab
+    global wav2vec2_model, wav2vec2_autocast
     if wav2vec2_model is None:
-        print("Loading wav2vec2 model...")
-        from transformers import Wav2Vec2ForCTC, Wav2Vec2FeatureExtractor
-        from huggingface_hub import hf_hub_download
-        import torch
-        
-        model_name = "facebook/wav2vec2-lv-60-espeak-cv-ft"
-        wav2vec2_processor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
-        wav2vec2_model = Wav2Vec2ForCTC.from_pretrained(model_name)
-        
-        vocab_path = hf_hub_download(repo_id=model_name, filename="vocab.json")
-        with open(vocab_path, 'r') as f:
-            vocab = json.load(f)
-        wav2vec2_vocab = {v: k for k, v in vocab.items()}
-        print("wav2vec2 loaded!")
-    return wav2vec2_model, wav2vec2_processor, wav2vec2_vocab
+        model = _load_wav2vec2_weights()
+        with _model_lock:
+            if wav2vec2_model is None:
+                import torch
+                
+                # Device placement happens in the process that runs inference;
+                # CUDA can't be carried across a fork
+                if torch.cuda.is_available():
+                    # fp16 weights; _infer casts inputs to match
+                    model = model.half().to('cuda')
+                elif getattr(torch.cpu, '_is_avx512_bf16_supported', lambda: False)():
+                    # Only worth it with native bf16 support; otherwise it is
+                    # emulated and slower than fp32
+                    wav2vec2_autocast = torch.bfloat16
+                # Dynamic shapes: clip lengths and batch sizes vary per call
+                wav2vec2_model = torch.compile(model, dynamic=True)
+    return wav2vec2_model, wav2vec2_processor, wav2vec2_vocab, wav2vec2_emits
+
+def load_models():
+    """Load both recognizers' weights (safe to share with forked workers)"""
+    get_allosaurus()
+    _load_wav2vec2_weights()
+
+def warmup_models():
+    """Load both recognizers and example audio so the first request doesn't pay for it"""
+    load_models()
+    # The alignment kernels compile on first call
+    align_sequences(['a'], ['a'])
+    # torch.compile traces on the first forward pass; do it here, not on a request
+    recognize_with_wav2vec2(np.zeros(SAMPLE_RATE, dtype=np.float32))
+    # Every example word is synthesized once up front for /api/speak
+    for word in set(PHONEME_EXAMPLES.values()):
+        _synth(word, SPEAK_VOICE, SPEAK_SPEED, SPEAK_PITCH)
 
 # Example words for phoneme playback
 PHONEME_EXAMPLES = {
@@ -103,139 +179,397 @@ SIMILAR_PHONES = {
     'm': {'m', 'n', 'ɱ'},
 }
 
+# Common diacritics stripped by normalize_phone
+_DIACRITIC_TABLE = str.maketrans('', '', 'ʲʰ̥̩ː̪̃̚͡')
+
+@lru_cache(maxsize=256)
 def normalize_phone(phone: str) -> str:
     """Remove diacritics and normalize phone"""
-    # Remove common diacritics
-    for diacritic in ['ʲ', 'ʰ', '̥', '̩', 'ː', '̪', '̃', '̚', '͡']:
-        phone = phone.replace(diacritic, '')
-    return phone
+    return phone.translate(_DIACRITIC_TABLE)
+
+def _symmetrize(table: dict) -> dict:
+    """Make similarity mutual: b is similar to a whenever a lists b"""
+    sym = defaultdict(set)
+    for phone, similar in table.items():
+        for other in similar:
+            sym[phone].add(other)
+            sym[other].add(phone)
+    return {phone: frozenset(similar) for phone, similar in sym.items()}
+
+# SIMILAR_PHONES with every relation made two-way, so one lookup suffices
+SYMMETRIC_SIMILAR_PHONES = _symmetrize(SIMILAR_PHONES)
+
+def _normalized_similar(p1_norm: str, p2_norm: str) -> bool:
+    """Check the similarity table for two already-normalized phones"""
+    return p1_norm == p2_norm or p2_norm in SYMMETRIC_SIMILAR_PHONES.get(p1_norm, ())
+
+# Integer IDs for the normalized phones of the similarity table's inventory,
+# precomputed into a dense match matrix. Phones outside it only ever match
+# themselves, so they are numbered per alignment (see _phone_ids) rather than
+# kept in a global table that client input could grow without bound.
+_KNOWN_PHONES = sorted({
+    normalize_phone(p) for k, vs in SIMILAR_PHONES.items() for p in (k, *vs)
+})
+_PHONE_IDS = {p: i for i, p in enumerate(_KNOWN_PHONES)}
+
+MATCH_MATRIX = np.array(
+    [[_normalized_similar(a, b) for b in _KNOWN_PHONES] for a in _KNOWN_PHONES],
+    dtype=np.uint8,
+)
+
+@lru_cache(maxsize=4096)
+def phone_id(phone: str) -> int:
+    """Map a phone to the ID of its normalized form, or -1 if it isn't known"""
+    return _PHONE_IDS.get(normalize_phone(phone), -1)
+
+def _phone_ids(phones: list, unknown: dict) -> np.ndarray:
+    """IDs for a phone sequence; unknown phones are numbered in `unknown`"""
+    ids = []
+    for phone in phones:
+        k = phone_id(phone)
+        if k < 0:
+            k = unknown.setdefault(normalize_phone(phone), len(_KNOWN_PHONES) + len(unknown))
+        ids.append(k)
+    return np.array(ids, dtype=np.int32)
 
 def phones_similar(p1: str, p2: str) -> bool:
     """Check if two phones are similar enough to count as correct"""
     if p1 == p2:
         return True
-    
-    # Normalize both
-    p1_norm = normalize_phone(p1)
-    p2_norm = normalize_phone(p2)
-    
-    if p1_norm == p2_norm:
-        return True
-    
-    # Check similarity sets
-    similar_set = SIMILAR_PHONES.get(p1_norm, {p1_norm})
-    if p2_norm in similar_set:
-        return True
-    
-    # Check reverse
-    similar_set2 = SIMILAR_PHONES.get(p2_norm, {p2_norm})
-    if p1_norm in similar_set2:
+    a, b = phone_id(p1), phone_id(p2)
+    if a < 0 or b < 0:
+        return normalize_phone(p1) == normalize_phone(p2)
+    return bool(MATCH_MATRIX[a, b])
+
+@njit(boundscheck=False)
+def _ids_match(a, b, match_mat):
+    if a == b:
         return True
-    
-    return False
+    k = match_mat.shape[0]
+    return a < k and b < k and match_mat[a, b] != 0
 
-def align_sequences(expected: list, actual: list) -> list:
+# Backtrack directions stored alongside the DP costs
+_DIAG, _UP, _LEFT = 0, 1, 2
+
+def _make_nw(match_mat: np.ndarray):
     """
-    Align two phone sequences using dynamic programming (edit distance style)
-    Returns list of {expected, actual, correct} for each expected phone
+    Compile the DP fill and traceback kernels with `match_mat` baked in.
+    Numba freezes the captured array as a constant, so each cell's
+    similarity check is a load from a fixed-shape table rather than an
+    argument lookup.
     """
-    n, m = len(expected), len(actual)
-    
-    # DP table: dp[i][j] = (cost, backtrack_direction)
-    # 0 = match/substitute, 1 = delete (skip actual), 2 = insert (skip expected)
-    INF = float('inf')
-    
-    # Cost matrix
-    dp = [[INF] * (m + 1) for _ in range(n + 1)]
-    dp[0][0] = 0
-    
-    # Initialize first row and column
-    for i in range(1, n + 1):
-        dp[i][0] = i  # deletions from expected
-    for j in range(1, m + 1):
-        dp[0][j] = j  # insertions from actual
-    
-    # Fill DP table
-    for i in range(1, n + 1):
-        for j in range(1, m + 1):
-            # Match or substitute
-            is_match = phones_similar(expected[i-1], actual[j-1])
-            sub_cost = 0 if is_match else 1
-            
-            dp[i][j] = min(
-                dp[i-1][j-1] + sub_cost,  # match/substitute
-                dp[i-1][j] + 1,            # delete from expected (no actual match)
-                dp[i][j-1] + 0.5           # skip actual phone (insertion, lower cost)
-            )
-    
-    # Backtrack to get alignment
-    results = []
-    i, j = n, m
-    alignment = []
-    
-    while i > 0 or j > 0:
-        if i > 0 and j > 0:
-            is_match = phones_similar(expected[i-1], actual[j-1])
-            sub_cost = 0 if is_match else 1
-            
-            if dp[i][j] == dp[i-1][j-1] + sub_cost:
+    @njit(boundscheck=False)
+    def _nw_fill(rows, bt, exp_ids, act_ids):
+        # Costs only ever look one row back, so they live in two rolling
+        # rows; the full matrix is kept as one byte of direction per cell
+        n, m = exp_ids.shape[0], act_ids.shape[0]
+        for j in range(m + 1):
+            rows[0, j] = j  # insertions from actual
+            bt[0, j] = _LEFT
+        for i in range(1, n + 1):
+            prev, cur = rows[(i - 1) & 1], rows[i & 1]
+            cur[0] = i  # deletions from expected
+            bt[i, 0] = _UP
+            a = exp_ids[i - 1]
+            for j in range(1, m + 1):
+                sub = 0.0 if _ids_match(a, act_ids[j - 1], match_mat) else 1.0
+                diag = prev[j - 1] + sub  # match/substitute
+                up = prev[j] + 1.0        # delete from expected (no actual match)
+                left = cur[j - 1] + 0.5   # skip actual phone (insertion, lower cost)
+                if diag <= up and diag <= left:
+                    cur[j] = diag
+                    bt[i, j] = _DIAG
+                elif up <= left:
+                    cur[j] = up
+                    bt[i, j] = _UP
+                else:
+                    cur[j] = left
+                    bt[i, j] = _LEFT
+
+    @njit(boundscheck=False)
+    def _nw_traceback(bt, exp_ids, act_ids):
+        # Every expected phone appears exactly once in the alignment, so the
+        # result is indexed by expected position: the aligned actual index
+        # (-1 if none) and whether the pair counts as correct.
+        n, m = exp_ids.shape[0], act_ids.shape[0]
+        act_idx = np.full(n, -1, dtype=np.int32)
+        correct = np.zeros(n, dtype=np.uint8)
+        i, j = n, m
+        while i > 0 or j > 0:
+            step = bt[i, j]
+            if step == _DIAG:
                 # Match or substitute
-                alignment.append((expected[i-1], actual[j-1], is_match))
+                act_idx[i - 1] = j - 1
+                correct[i - 1] = _ids_match(exp_ids[i - 1], act_ids[j - 1], match_mat)
                 i -= 1
                 j -= 1
-            elif dp[i][j] == dp[i-1][j] + 1:
+            elif step == _UP:
                 # Skip expected (no match in actual)
-                alignment.append((expected[i-1], None, False))
                 i -= 1
             else:
                 # Skip actual (extra phone detected)
                 j -= 1
-        elif i > 0:
-            alignment.append((expected[i-1], None, False))
-            i -= 1
-        else:
-            j -= 1
+        return act_idx, correct
+    
+    return _nw_fill, _nw_traceback
+
+_nw_fill, _nw_traceback = _make_nw(MATCH_MATRIX)
+
+# Per-thread DP scratch space, grown geometrically and reused across requests.
+# Alignments bigger than DP_BUF_MAX_CELLS get one-off buffers instead, so a
+# single oversized request can't pin memory in a thread for good.
+DP_BUF_MAX_CELLS = 1 << 20
+_DP_BUF = threading.local()
+
+def _dp_buffers(rows: int, cols: int):
+    """Two rolling float32 cost rows and a (rows, cols) uint8 direction matrix"""
+    if rows * cols > DP_BUF_MAX_CELLS:
+        return np.empty((2, cols), dtype=np.float32), np.empty((rows, cols), dtype=np.uint8)
+    
+    bt = getattr(_DP_BUF, 'bt', None)
+    if bt is None or bt.shape[0] < rows or bt.shape[1] < cols:
+        if bt is not None:
+            # Only the dimension that overflowed grows
+            old_rows, old_cols = bt.shape
+            grown_rows = max(rows, 2 * old_rows) if rows > old_rows else old_rows
+            grown_cols = max(cols, 2 * old_cols) if cols > old_cols else old_cols
+            if grown_rows * grown_cols <= DP_BUF_MAX_CELLS:
+                rows, cols = grown_rows, grown_cols
+        _DP_BUF.cost = np.empty((2, cols), dtype=np.float32)
+        _DP_BUF.bt = np.empty((rows, cols), dtype=np.uint8)
+    return _DP_BUF.cost, _DP_BUF.bt
+
+def align_sequences(expected: list, actual: list) -> list:
+    """
+    Align two phone sequences using dynamic programming (edit distance style)
+    Returns list of {expected, actual, correct} for each expected phone
+    """
+    n, m = len(expected), len(actual)
+    # Unknown phones get IDs that only live for this call
+    unknown = {}
+    exp_ids = _phone_ids(expected, unknown)
+    act_ids = _phone_ids(actual, unknown)
     
-    # Reverse alignment
-    alignment.reverse()
+    cost, bt = _dp_buffers(n + 1, m + 1)
+    bt = bt[:n + 1, :m + 1]
+    _nw_fill(cost, bt, exp_ids, act_ids)
+    act_idx, correct = _nw_traceback(bt, exp_ids, act_ids)
     
-    # Convert to result format
-    for exp, act, correct in alignment:
-        results.append({
+    return [
+        {
             'expected': exp,
-            'actual': act,
-            'correct': correct
-        })
+            'actual': actual[j] if j >= 0 else None,
+            'correct': bool(c),
+        }
+        for exp, j, c in zip(expected, act_idx.tolist(), correct.tolist())
+    ]
+
+SAMPLE_RATE = 16000
+
+def decode_audio(audio_bytes: bytes) -> np.ndarray:
+    """Decode an uploaded clip (WebM, WAV, ...) to mono float32 at SAMPLE_RATE"""
+    import av
+    
+    resampler = av.AudioResampler(format='flt', layout='mono', rate=SAMPLE_RATE)
+    chunks = []
+    with av.open(io.BytesIO(audio_bytes)) as container:
+        for frame in container.decode(audio=0):
+            for out in resampler.resample(frame):
+                chunks.append(out.to_ndarray().reshape(-1))
+        # Flush samples still buffered in the resampler
+        for out in resampler.resample(None):
+            chunks.append(out.to_ndarray().reshape(-1))
     
-    return results
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(chunks)
+
+# Allosaurus only reads from a WAV path; keep those files on RAM-backed
+# tmpfs where the platform has one
+AUDIO_TMP_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+def _is_native_wav(audio_bytes: bytes) -> bool:
+    """Whether an upload is already 16-bit mono WAV at SAMPLE_RATE"""
+    if audio_bytes[:4] != b'RIFF' or audio_bytes[8:12] != b'WAVE':
+        return False
+    try:
+        with wave.open(io.BytesIO(audio_bytes)) as w:
+            return (w.getnchannels(), w.getsampwidth(), w.getframerate()) == (1, 2, SAMPLE_RATE)
+    except (wave.Error, EOFError):
+        return False
 
-def recognize_with_allosaurus(wav_path: str) -> str:
+def recognize_with_allosaurus(audio_bytes: bytes) -> str:
+    import soundfile as sf
+    
     model = get_allosaurus()
-    return model.recognize(wav_path)
+    # Uploads that are already in the right format are passed through as-is
+    if not _is_native_wav(audio_bytes):
+        buf = io.BytesIO()
+        sf.write(buf, decode_audio(audio_bytes), SAMPLE_RATE, subtype='PCM_16', format='WAV')
+        audio_bytes = buf.getvalue()
+    
+    with tempfile.NamedTemporaryFile(suffix='.wav', dir=AUDIO_TMP_DIR) as f:
+        f.write(audio_bytes)
+        f.flush()
+        return model.recognize(f.name)
+
+# wav2vec2 micro-batching: requests arriving within BATCH_WINDOW seconds of
+# each other share one padded forward pass
+MAX_BATCH = 8
+BATCH_WINDOW = 0.02
 
-def recognize_with_wav2vec2(wav_path: str) -> str:
-    import torch
-    import librosa
+class BatchedWav2Vec2Runner:
+    """Coalesces concurrent wav2vec2 requests into padded batches"""
     
-    model, processor, vocab = get_wav2vec2()
-    audio, sr = librosa.load(wav_path, sr=16000)
-    input_values = processor(audio, sampling_rate=16000, return_tensors="pt").input_values
+    def __init__(self, max_batch: int = MAX_BATCH, window: float = BATCH_WINDOW):
+        self.max_batch = max_batch
+        self.window = window
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
     
-    with torch.no_grad():
-        logits = model(input_values).logits
+    def submit(self, audio: np.ndarray) -> Future:
+        """Queue a SAMPLE_RATE waveform; the future resolves to its per-frame CTC ids"""
+        future = Future()
+        self._queue.put((audio, future))
+        self._ensure_worker()
+        return future
     
-    predicted_ids = torch.argmax(logits, dim=-1)[0].tolist()
+    def _ensure_worker(self):
+        # Started lazily (and restarted after a fork) from whichever thread
+        # submits first
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, daemon=True)
+                    self._worker.start()
     
-    prev_id = None
-    phonemes = []
-    for idx in predicted_ids:
-        if idx != prev_id and idx != 0:
-            token = vocab.get(idx, '?')
-            if token not in ['<pad>', '<s>', '</s>', '<unk>']:
-                phonemes.append(token)
-        prev_id = idx
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            
+            try:
+                results = self._infer([audio for audio, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), ids in zip(batch, results):
+                    future.set_result(ids)
     
-    return ' '.join(phonemes)
+    def _infer(self, audios: list) -> list:
+        import torch
+        
+        model, processor, _, _ = get_wav2vec2()
+        param = next(model.parameters())
+        inputs = processor(
+            audios, sampling_rate=SAMPLE_RATE, padding=True,
+            return_attention_mask=True, return_tensors="pt",
+        )
+        input_values = inputs.input_values.to(param.device, dtype=param.dtype)
+        attention_mask = inputs.attention_mask.to(param.device)
+        
+        with torch.inference_mode(), torch.autocast(
+            device_type=param.device.type,
+            dtype=wav2vec2_autocast or param.dtype,
+            enabled=wav2vec2_autocast is not None,
+        ):
+            logits = model(input_values, attention_mask=attention_mask).logits
+        
+        predicted_ids = torch.argmax(logits, dim=-1).cpu().numpy()
+        # Drop the frames that only cover each clip's padding
+        lengths = model._get_feat_extract_output_lengths(inputs.attention_mask.sum(-1))
+        lengths = lengths.clamp(min=0)
+        return [ids[:n] for ids, n in zip(predicted_ids, lengths.tolist())]
+
+BATCHER = BatchedWav2Vec2Runner()
+
+def _ctc_decode(predicted_ids: np.ndarray, tokens: np.ndarray, emits: np.ndarray) -> str:
+    """Collapse repeated CTC ids, drop blanks/special tokens, join as phones"""
+    if predicted_ids.size == 0:
+        return ''
+    keep = np.empty(predicted_ids.shape, dtype=bool)
+    keep[0] = True
+    np.not_equal(predicted_ids[1:], predicted_ids[:-1], out=keep[1:])
+    keep &= emits[predicted_ids]
+    return ' '.join(tokens[predicted_ids[keep]].tolist())
+
+# Long clips are recognized in overlapping windows so memory per forward pass
+# stays bounded; each window's frames are kept up to the middle of its
+# overlap with the next one
+CHUNK_SECONDS = 20
+# Receptive field of wav2vec2's conv feature encoder (one output frame)
+MIN_WAV2VEC2_SAMPLES = 400
+CHUNK_OVERLAP_SECONDS = 2
+
+def _chunk_windows(n_samples: int, samples_per_frame: int) -> list:
+    """Split a clip into (start, end, first_frame, last_frame) windows"""
+    chunk = CHUNK_SECONDS * SAMPLE_RATE
+    half_overlap = CHUNK_OVERLAP_SECONDS * SAMPLE_RATE // 2
+    stride = chunk - 2 * half_overlap
+    
+    windows = []
+    start = 0
+    while True:
+        end = min(start + chunk, n_samples)
+        first = 0 if start == 0 else half_overlap // samples_per_frame
+        last = None if end == n_samples else (end - start - half_overlap) // samples_per_frame
+        windows.append((start, end, first, last))
+        if end == n_samples:
+            return windows
+        start += stride
+
+def recognize_with_wav2vec2(audio: np.ndarray) -> str:
+    # Shorter than the feature encoder's receptive field: no frames to decode
+    if len(audio) < MIN_WAV2VEC2_SAMPLES:
+        return ''
+    model, _, tokens, emits = get_wav2vec2()
+    windows = _chunk_windows(len(audio), model.config.inputs_to_logits_ratio)
+    # Submitted together so the windows of one clip share batches
+    futures = [BATCHER.submit(audio[start:end]) for start, end, _, _ in windows]
+    predicted_ids = np.concatenate([
+        future.result()[first:last]
+        for future, (_, _, first, last) in zip(futures, windows)
+    ])
+    # Collapsing over the stitched sequence also dedups repeats at the seams
+    return _ctc_decode(predicted_ids, tokens, emits)
+
+def _recognize_uncached(audio_bytes: bytes, model_type: str) -> str:
+    if model_type == 'wav2vec2':
+        return recognize_with_wav2vec2(decode_audio(audio_bytes))
+    return recognize_with_allosaurus(audio_bytes)
+
+# Recognized phone strings keyed by (audio digest, model). Drills repeat the
+# same prompt and clients retry, so identical uploads skip decoding and
+# inference entirely.
+AUDIO_CACHE_SIZE = 2048
+_audio_cache = OrderedDict()
+_audio_cache_lock = threading.Lock()
+
+def recognize_audio(audio_bytes: bytes, model_type: str) -> str:
+    """Recognize phones in an uploaded clip, reusing results for repeat uploads"""
+    key = (hashlib.blake2b(audio_bytes, digest_size=16).digest(), model_type)
+    with _audio_cache_lock:
+        if key in _audio_cache:
+            _audio_cache.move_to_end(key)
+            return _audio_cache[key]
+    
+    phones_str = _recognize_uncached(audio_bytes, model_type)
+    
+    with _audio_cache_lock:
+        _audio_cache[key] = phones_str
+        if len(_audio_cache) > AUDIO_CACHE_SIZE:
+            _audio_cache.popitem(last=False)
+    return phones_str
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
@@ -249,31 +583,9 @@ def analyze():
         
         expected_phones = json.loads(expected)
         
-        # Save to temp file
-        with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as f:
-            audio_file.save(f.name)
-            webm_path = f.name
-        
-        # Convert to wav
-        wav_path = webm_path.replace('.webm', '.wav')
-        subprocess.run([
-            'ffmpeg', '-y', '-i', webm_path, 
-            '-ar', '16000', '-ac', '1', 
-            wav_path
-        ], capture_output=True)
-        
-        # Recognize
-        if model_type == 'wav2vec2':
-            phones_str = recognize_with_wav2vec2(wav_path)
-        else:
-            phones_str = recognize_with_allosaurus(wav_path)
-        
+        phones_str = recognize_audio(audio_file.read(), model_type)
         actual_phones = phones_str.split()
         
-        # Clean up
-        os.unlink(webm_path)
-        os.unlink(wav_path)
-        
         # Use proper alignment
         comparison = align_sequences(expected_phones, actual_phones)
         
@@ -296,6 +608,23 @@ def analyze():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+# espeak-ng settings for phoneme playback
+SPEAK_VOICE = 'en-us'
+SPEAK_SPEED = 120
+SPEAK_PITCH = 50
+
+@lru_cache(maxsize=256)
+def _synth(word: str, voice: str, speed: int, pitch: int) -> bytes:
+    """Synthesize a word with espeak-ng and return the WAV bytes"""
+    # Written to a file rather than --stdout: on a pipe espeak-ng can't seek
+    # back to fill in the RIFF/data sizes, leaving a malformed header
+    with tempfile.NamedTemporaryFile(suffix='.wav', dir=AUDIO_TMP_DIR) as f:
+        subprocess.run([
+            'espeak-ng', '-v', voice, '-s', str(speed), '-p', str(pitch),
+            '-w', f.name, word
+        ], capture_output=True, check=True)
+        return f.read()
+
 @app.route('/api/speak', methods=['POST'])
 def speak():
     try:
@@ -303,19 +632,7 @@ def speak():
         phoneme = data.get('phoneme', '')
         example_word = PHONEME_EXAMPLES.get(phoneme, phoneme)
         
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            wav_path = f.name
-        
-        subprocess.run([
-            'espeak-ng', '-v', 'en-us', '-s', '120', '-p', '50',
-            '-w', wav_path, example_word
-        ], capture_output=True)
-        
-        with open(wav_path, 'rb') as f:
-            audio_data = f.read()
-        
-        os.unlink(wav_path)
-        
+        audio_data = _synth(example_word, SPEAK_VOICE, SPEAK_SPEED, SPEAK_PITCH)
         return send_file(io.BytesIO(audio_data), mimetype='audio/wav')
         
     except Exception as e:
@@ -326,6 +643,13 @@ def speak():
 def health():
     return jsonify({'status': 'ok'})
 
+def start_background_warmup():
+    threading.Thread(target=warmup_models, daemon=True).start()
+
 if __name__ == '__main__':
-    get_allosaurus()
-    app.run(port=5001, debug=True)
+    app.debug = True
+    # The debug reloader also runs this module in its file-watching parent,
+    # which never serves requests; only warm up the serving process
+    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_warmup()
+    app.run(port=5001, debug=app.debug)
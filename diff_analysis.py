@@ -55,14 +55,23 @@ issues = {
     "extra": "Extra sound inserted",
 }
 
+# Phone sets for each accent marker
+TH_SET = frozenset({"θ"})
+TAP_R_SRC = frozenset({"ɹ", "ɹ̩"})
+TAP_R_DST = frozenset({"ɾ"})
+PAL_L_SET = frozenset({"lʲ"})
+
 for word, nat, spk in comparisons:
+    nat_set = frozenset(nat.split())
+    spk_set = frozenset(spk.split())
+    
     # Detect issues
     detected = []
-    if "θ" in nat and "θ" not in spk:
+    if TH_SET & nat_set and not TH_SET & spk_set:
         detected.append("θ→t/d")
-    if "ɹ" in nat and "ɾ" in spk:
+    if TAP_R_SRC & nat_set and TAP_R_DST & spk_set:
         detected.append("ɹ→ɾ")
-    if "lʲ" in spk and "lʲ" not in nat:
+    if PAL_L_SET & spk_set and not PAL_L_SET & nat_set:
         detected.append("l→lʲ")
     if nat != spk and not detected:
         detected.append("diff")
@@ -7,11 +7,11 @@ Phone Alignment & Scoring using:
 import panphon
 from panphon.distance import Distance
 import numpy as np
+from numba import njit
 
 dst = Distance()
 
-def phone_distance(p1, p2):
-    """Get distance between two phones (0 = identical, 1 = very different)"""
+def _feature_distance(p1, p2):
     if p1 == p2:
         return 0.0
     if p1 == '-' or p2 == '-':  # gap
@@ -21,44 +21,130 @@ def phone_distance(p1, p2):
     except:
         return 1.0  # unknown phone
 
-def needleman_wunsch(seq1, seq2, gap_penalty=0.5):
-    """Align two phone sequences using Needleman-Wunsch algorithm"""
-    n, m = len(seq1), len(seq2)
+# Pairwise feature distances, precomputed for a seed inventory of English
+# and common accented phones and extended the first time a new phone is seen
+SEED_PHONES = """
+p b t d k g ɡ f v θ ð s z ʃ ʒ h m n ŋ l ɹ ɾ r w j tʃ dʒ
+tʰ kʰ pʰ b̥ d̥ lʲ ɫ ʁ ʂ tʂ x ɦ ʋ β ʝ ɲ ɱ
+i ɪ e ɛ æ a ɑ ɒ ɔ o ʊ u ə ʌ ɚ ɜ ɝ ɐ ɨ ɤ iː uː ɹ̩
+""".split()
+PHONE_IDS = {}
+DIST = np.zeros((0, 0))
+
+def add_phones(phones):
+    """Extend the distance table with any phones it doesn't cover yet"""
+    global DIST
+    new = [p for p in dict.fromkeys(phones) if p not in PHONE_IDS]
+    if not new:
+        return
+    old_n = len(PHONE_IDS)
+    for p in new:
+        PHONE_IDS[p] = len(PHONE_IDS)
+    vocab = list(PHONE_IDS)
     
-    # Initialize score matrix
-    score = np.zeros((n + 1, m + 1))
-    for i in range(n + 1):
-        score[i][0] = i * gap_penalty
-    for j in range(m + 1):
-        score[0][j] = j * gap_penalty
+    dist = np.empty((len(vocab), len(vocab)))
+    dist[:old_n, :old_n] = DIST
+    for i, p1 in enumerate(vocab):
+        for j in range(old_n if i < old_n else 0, len(vocab)):
+            dist[i, j] = _feature_distance(p1, vocab[j])
+    DIST = dist
+
+add_phones(SEED_PHONES)
+
+def phone_distance(p1, p2):
+    """Get distance between two phones (0 = identical, 1 = very different)"""
+    try:
+        return float(DIST[PHONE_IDS[p1], PHONE_IDS[p2]])
+    except KeyError:
+        return _feature_distance(p1, p2)
+
+# Traceback directions
+_DIAG, _UP, _LEFT = 0, 1, 2
+
+@njit
+def _nw_band(seq1_ids, seq2_ids, sub_cost, band, gap):
+    """
+    Fill the score matrix within `band` cells of the diagonal. Cells outside
+    the band are skipped but still allocated, so banding saves work only,
+    not memory.
+    """
+    n, m = seq1_ids.shape[0], seq2_ids.shape[0]
+    score = np.full((n + 1, m + 1), np.inf, dtype=np.float64)
+    bt = np.zeros((n + 1, m + 1), dtype=np.uint8)
+    for i in range(min(n, band) + 1):
+        score[i, 0] = i * gap
+        bt[i, 0] = _UP
+    for j in range(min(m, band) + 1):
+        score[0, j] = j * gap
+        bt[0, j] = _LEFT
     
-    # Fill score matrix
     for i in range(1, n + 1):
-        for j in range(1, m + 1):
-            match = score[i-1][j-1] + phone_distance(seq1[i-1], seq2[j-1])
-            delete = score[i-1][j] + gap_penalty
-            insert = score[i][j-1] + gap_penalty
-            score[i][j] = min(match, delete, insert)
-    
-    # Traceback to get alignment
-    align1, align2 = [], []
+        a = seq1_ids[i - 1]
+        for j in range(max(1, i - band), min(m, i + band) + 1):
+            match = score[i - 1, j - 1] + sub_cost[a, seq2_ids[j - 1]]
+            delete = score[i - 1, j] + gap
+            insert = score[i, j - 1] + gap
+            if match <= delete and match <= insert:
+                score[i, j] = match
+                bt[i, j] = _DIAG
+            elif delete <= insert:
+                score[i, j] = delete
+                bt[i, j] = _UP
+            else:
+                score[i, j] = insert
+                bt[i, j] = _LEFT
+    return score, bt
+
+@njit
+def _nw_traceback(bt, n, m):
+    """Walk the directions back from (n, m); -1 marks a gap"""
+    idx1 = np.empty(n + m, dtype=np.int32)
+    idx2 = np.empty(n + m, dtype=np.int32)
+    k = 0
     i, j = n, m
     while i > 0 or j > 0:
-        if i > 0 and j > 0 and score[i][j] == score[i-1][j-1] + phone_distance(seq1[i-1], seq2[j-1]):
-            align1.append(seq1[i-1])
-            align2.append(seq2[j-1])
+        step = bt[i, j]
+        if step == _DIAG:
             i -= 1
             j -= 1
-        elif i > 0 and score[i][j] == score[i-1][j] + gap_penalty:
-            align1.append(seq1[i-1])
-            align2.append('-')
+            idx1[k], idx2[k] = i, j
+        elif step == _UP:
             i -= 1
+            idx1[k], idx2[k] = i, -1
         else:
-            align1.append('-')
-            align2.append(seq2[j-1])
             j -= 1
+            idx1[k], idx2[k] = -1, j
+        k += 1
+    return idx1[:k][::-1], idx2[:k][::-1]
+
+def needleman_wunsch(seq1, seq2, gap_penalty=0.5, band=None):
+    """
+    Align two phone sequences using Needleman-Wunsch algorithm.
+    With `band` set, only cells within that many of the diagonal are scored:
+    faster, but the result is no longer optimal if the best path strays
+    further (e.g. a run of leading noise phones in one sequence).
+    """
+    n, m = len(seq1), len(seq2)
+    
+    # Full matrix unless banding was asked for and can still reach (n, m)
+    if band is None or abs(n - m) > band:
+        width = max(n, m)
+    else:
+        width = band
+    
+    add_phones(seq1)
+    add_phones(seq2)
+    seq1_ids = np.array([PHONE_IDS[p] for p in seq1], dtype=np.int32)
+    seq2_ids = np.array([PHONE_IDS[p] for p in seq2], dtype=np.int32)
+    
+    score, bt = _nw_band(seq1_ids, seq2_ids, DIST, width, np.float64(gap_penalty))
+    
+    # Traceback to get alignment
+    idx1, idx2 = _nw_traceback(bt, n, m)
+    align1 = [seq1[i] if i >= 0 else '-' for i in idx1.tolist()]
+    align2 = [seq2[j] if j >= 0 else '-' for j in idx2.tolist()]
     
-    return align1[::-1], align2[::-1], score[n][m]
+    return align1, align2, float(score[n, m])
 
 def compare_pronunciations(native_phones, speaker_phones):
     """Compare two phone strings and return detailed analysis"""
@@ -2,6 +2,7 @@ from transformers import Wav2Vec2ForCTC, Wav2Vec2FeatureExtractor
 import torch
 import librosa
 import json
+import numpy as np
 from huggingface_hub import hf_hub_download
 
 # Load model and components
@@ -19,6 +20,12 @@ with open(vocab_path, 'r') as f:
 # Create id2token mapping
 id2token = {v: k for k, v in vocab.items()}
 
+# Token lookup indexed by id, plus which ids produce a phone (0 is the blank)
+vocab_size = max(model.config.vocab_size, max(id2token) + 1)
+tokens = np.array([id2token.get(i, '?') for i in range(vocab_size)], dtype=object)
+emits = np.array([i != 0 and t not in ['<pad>', '<s>', '</s>', '<unk>']
+                  for i, t in enumerate(tokens)])
+
 print("Model loaded successfully!")
 
 # Load audio at 16kHz (required by wav2vec2)
@@ -26,28 +33,38 @@ print("Loading audio...")
 audio, sr = librosa.load("omer2.wav", sr=16000)
 print(f"Audio duration: {len(audio)/sr:.2f} seconds")
 
-# Process audio
-input_values = feature_extractor(audio, sampling_rate=16000, return_tensors="pt").input_values
-
-# Retrieve logits
+# Run inference in 20s windows overlapping by 2s so long recordings don't
+# exhaust memory; each window keeps its frames up to the middle of the overlap
 print("Running inference...")
-with torch.no_grad():
-    logits = model(input_values).logits
+chunk, half_overlap = 20 * sr, sr
+samples_per_frame = model.config.inputs_to_logits_ratio
+chunk_ids = []
+start = 0
+while True:
+    end = min(start + chunk, len(audio))
+    
+    # Process audio
+    input_values = feature_extractor(audio[start:end], sampling_rate=16000, return_tensors="pt").input_values
+    
+    # Retrieve logits
+    with torch.no_grad():
+        logits = model(input_values).logits
+    
+    # Take argmax
+    ids = torch.argmax(logits, dim=-1)[0].numpy()
+    first = 0 if start == 0 else half_overlap // samples_per_frame
+    last = len(ids) if end == len(audio) else (end - start - half_overlap) // samples_per_frame
+    chunk_ids.append(ids[first:last])
+    
+    if end == len(audio):
+        break
+    start += chunk - 2 * half_overlap
 
-# Take argmax and decode
-predicted_ids = torch.argmax(logits, dim=-1)[0].tolist()
+predicted_ids = np.concatenate(chunk_ids)
 
 # Decode manually - collapse repeated tokens and remove blanks
-prev_id = None
-phonemes = []
-for idx in predicted_ids:
-    if idx != prev_id and idx != 0:  # 0 is typically the blank token
-        token = id2token.get(idx, '?')
-        if token not in ['<pad>', '<s>', '</s>', '<unk>']:
-            phonemes.append(token)
-    prev_id = idx
-
-transcription = ' '.join(phonemes)
+keep = np.concatenate(([True], predicted_ids[1:] != predicted_ids[:-1])) & emits[predicted_ids]
+transcription = ' '.join(tokens[predicted_ids[keep]].tolist())
 
 print("\n✅ Phoneme transcription:")
 print(transcription)